@@ -16,6 +16,7 @@ if __name__ == "__main__":
         time_skip=10,
         hidden_size=256,
         num_hidden_layers=2,
+        mixed_precision=False,
         reward_scale=1.0,
         discount=0.99,
         initial_alpha=1.0,
@@ -23,6 +24,7 @@ if __name__ == "__main__":
         qf_learning_rate=0.0003,
         tau=0.005,
         batch_size=256,
+        num_updates_per_sample=100,
         max_path_length=1000,
         num_workers=10,
         num_warm_up_steps=100000,
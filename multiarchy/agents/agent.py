@@ -49,6 +49,22 @@ class Agent(ABC):
                 goal_skip=self.goal_skip,
                 hierarchy_selector=hierarchy_selector)
 
+    def train_n(
+            self,
+            num_iterations,
+            hierarchy_selector=(lambda x: x)
+    ):
+        # train the algorithm for several iterations in a single call
+        iteration = self.iteration + 1
+        self.iteration += num_iterations
+        if self.algorithm is not None:
+            self.algorithm.fit_n(
+                iteration,
+                num_iterations,
+                time_skip=self.time_skip,
+                goal_skip=self.goal_skip,
+                hierarchy_selector=hierarchy_selector)
+
     @abstractmethod
     def get_weights(
             self,
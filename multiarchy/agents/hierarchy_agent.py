@@ -46,6 +46,18 @@ class HierarchyAgent(Agent):
                 iteration=iteration,
                 hierarchy_selector=(lambda x: hierarchy_selector(x)[i]))
 
+    def train_n(
+            self,
+            num_iterations,
+            hierarchy_selector=(lambda x: x)
+    ):
+        # train the algorithm for several iterations in a single call
+        Agent.train_n(self, num_iterations, hierarchy_selector=hierarchy_selector)
+        for i, agent in enumerate(self.agents):
+            agent.train_n(
+                num_iterations,
+                hierarchy_selector=(lambda x: hierarchy_selector(x)[i]))
+
     def get_weights(
             self,
     ):
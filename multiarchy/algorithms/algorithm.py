@@ -1,7 +1,9 @@
 """Author: Brandon Trabucco, Copyright 2019, MIT License"""
 
 
+from multiarchy import nested_apply
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 
 class Algorithm(ABC):
@@ -10,6 +12,7 @@ class Algorithm(ABC):
             self,
             replay_buffer,
             batch_size=32,
+            num_updates_per_sample=100,
             update_every=1,
             update_after=0,
             logger=None,
@@ -21,6 +24,9 @@ class Algorithm(ABC):
         # batch size for samples form replay buffer
         self.batch_size = batch_size
 
+        # number of minibatches sampled together from the replay buffer in fit_n
+        self.num_updates_per_sample = num_updates_per_sample
+
         # specify the number of episodes to collect
         self.update_every = update_every
         self.update_after = update_after
@@ -41,6 +47,15 @@ class Algorithm(ABC):
         if self.logger is not None:
             self.logger.record(self.logging_prefix + key, value)
 
+    def record_diagnostics(
+            self,
+            diagnostics
+    ):
+        # record a dictionary of diagnostic tensors returned by an update
+        if diagnostics is not None:
+            for key, value in diagnostics.items():
+                self.record(key, value.numpy())
+
     @abstractmethod
     def update_algorithm(
             self,
@@ -48,6 +63,19 @@ class Algorithm(ABC):
     ):
         return NotImplemented
 
+    def update_algorithm_n(
+            self,
+            num_updates,
+            *args
+    ):
+        # split a large batch into minibatches and update on each of them
+        for i in range(num_updates):
+            self.update_algorithm(*nested_apply(
+                lambda x: x[i * self.batch_size:(i + 1) * self.batch_size], args))
+
+        # each update records its own diagnostics so none are returned
+        return None
+
     def fit(
             self,
             iteration,
@@ -67,3 +95,48 @@ class Algorithm(ABC):
 
             # samples are pulled from the replay buffer on the fly
             self.update_algorithm(*batch_of_data)
+
+    def fit_n(
+            self,
+            iteration,
+            num_iterations,
+            time_skip=1,
+            goal_skip=1,
+            hierarchy_selector=(lambda x: x)
+    ):
+        # count the iterations that would have triggered an update
+        num_updates = 0
+        for i in range(iteration, iteration + num_iterations):
+            if (i >= self.update_after) and (
+                    i - self.last_update_iteration >= self.update_every):
+                self.last_update_iteration = i
+                num_updates += 1
+
+        # a non positive batch size samples everything for each update
+        if self.batch_size <= 0:
+            for i in range(num_updates):
+                self.update_algorithm(*self.replay_buffer.sample(
+                    self.batch_size, time_skip=time_skip, goal_skip=goal_skip, hierarchy_selector=hierarchy_selector))
+
+        # otherwise get the batches of data from the replay buffer in large groups
+        elif num_updates > 0:
+            group_sizes = [min(self.num_updates_per_sample, num_updates - i)
+                           for i in range(0, num_updates, self.num_updates_per_sample)]
+
+            def sample(group_size):
+                return self.replay_buffer.sample(
+                    self.batch_size * group_size, time_skip=time_skip, goal_skip=goal_skip, hierarchy_selector=hierarchy_selector)
+
+            # the next group is sampled in the background while training on this group
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                pending = executor.submit(sample, group_sizes[0])
+                for j, group_size in enumerate(group_sizes):
+                    batch_of_data = pending.result()
+                    if j + 1 < len(group_sizes):
+                        pending = executor.submit(sample, group_sizes[j + 1])
+
+                    # samples are split into minibatches for each update
+                    diagnostics = self.update_algorithm_n(group_size, *batch_of_data)
+
+            # every update shares a logging step so record only the last one
+            self.record_diagnostics(diagnostics)
@@ -94,5 +94,5 @@ class DDPG(Algorithm):
             self.qf.compute_gradients(qf_loss, tape))
 
         # soft update target parameters
-        self.target_policy.soft_update(self.policy.get_weights())
-        self.target_qf.soft_update(self.qf.get_weights())
+        self.target_policy.soft_update(self.policy.model.weights)
+        self.target_qf.soft_update(self.qf.model.weights)
@@ -22,6 +22,7 @@ class TD3(Algorithm):
             target_noise=0.2,
             observation_key="observation",
             batch_size=32,
+            num_updates_per_sample=100,
             update_every=1,
             update_after=0,
             logger=None,
@@ -32,6 +33,7 @@ class TD3(Algorithm):
             self,
             replay_buffer,
             batch_size=batch_size,
+            num_updates_per_sample=num_updates_per_sample,
             update_every=update_every,
             update_after=update_after,
             logger=logger,
@@ -54,7 +56,13 @@ class TD3(Algorithm):
         self.target_clipping = target_clipping
         self.target_noise = target_noise
 
-    def update_algorithm(
+    @tf.function(input_signature=[
+        tf.TensorSpec(shape=[None, None], dtype=tf.float32),
+        tf.TensorSpec(shape=[None, None], dtype=tf.float32),
+        tf.TensorSpec(shape=[None], dtype=tf.float32),
+        tf.TensorSpec(shape=[None, None], dtype=tf.float32),
+        tf.TensorSpec(shape=[None], dtype=tf.float32)])
+    def update_step(
             self,
             observations,
             actions,
@@ -62,63 +70,110 @@ class TD3(Algorithm):
             next_observations,
             terminals
     ):
-        # select from the observation dictionary
-        observations = observations[self.observation_key]
-        next_observations = next_observations[self.observation_key]
+        # the q function targets only need values so they are kept off the tape
+        next_mean_actions, next_log_pi = self.target_policy.expected_value(
+            next_observations)
+
+        # build the target policy noise
+        noise = tf.clip_by_value(
+            self.target_noise * tf.random.normal(tf.shape(next_mean_actions)),
+            -self.target_clipping, self.target_clipping)
+        next_noisy_actions = next_mean_actions + noise
+
+        # build the q function target value
+        inputs = tf.concat([next_observations, next_noisy_actions], -1)
+        target_qf1_value = self.target_qf1(inputs)[..., 0]
+        target_qf2_value = self.target_qf2(inputs)[..., 0]
+        qf_targets = tf.stop_gradient(
+            self.reward_scale * rewards + terminals * self.discount * (
+                tf.minimum(target_qf1_value, target_qf2_value)))
 
         # build a tape to collect gradients from the policy and critics
         with tf.GradientTape(persistent=True) as tape:
             mean_actions, log_pi = self.policy.expected_value(observations)
-            next_mean_actions, next_log_pi = self.target_policy.expected_value(
-                next_observations)
-
-            # build the target policy noise
-            noise = tf.clip_by_value(
-                self.target_noise * tf.random.normal(tf.shape(mean_actions)),
-                -self.target_clipping, self.target_clipping)
-            next_noisy_actions = next_mean_actions + noise
-
-            # build the q function target value
-            inputs = tf.concat([next_observations, next_noisy_actions], -1)
-            target_qf1_value = self.target_qf1(inputs)[..., 0]
-            self.record("target_qf1_value", tf.reduce_mean(target_qf1_value).numpy())
-            target_qf2_value = self.target_qf2(inputs)[..., 0]
-            self.record("target_qf2_value", tf.reduce_mean(target_qf2_value).numpy())
-            qf_targets = tf.stop_gradient(
-                self.reward_scale * rewards + terminals * self.discount * (
-                    tf.minimum(target_qf1_value, target_qf2_value)))
-            self.record("qf_targets", tf.reduce_mean(qf_targets).numpy())
 
             # build the q function loss
             inputs = tf.concat([observations, actions], -1)
             qf1_value = self.qf1(inputs)[..., 0]
-            self.record("qf1_value", tf.reduce_mean(qf1_value).numpy())
             qf2_value = self.qf2(inputs)[..., 0]
-            self.record("qf2_value", tf.reduce_mean(qf2_value).numpy())
             qf1_loss = tf.reduce_mean(tf.keras.losses.logcosh(qf_targets, qf1_value))
-            self.record("qf1_loss", qf1_loss.numpy())
             qf2_loss = tf.reduce_mean(tf.keras.losses.logcosh(qf_targets, qf2_value))
-            self.record("qf2_loss", qf2_loss.numpy())
 
             # build the policy loss
             inputs = tf.concat([observations, mean_actions], -1)
             policy_qf1_value = self.qf1(inputs)[..., 0]
-            self.record("policy_qf1_value", tf.reduce_mean(policy_qf1_value).numpy())
             policy_qf2_value = self.qf2(inputs)[..., 0]
-            self.record("policy_qf2_value", tf.reduce_mean(policy_qf2_value).numpy())
             policy_loss = -tf.reduce_mean(
                 tf.minimum(policy_qf1_value, policy_qf2_value))
-            self.record("policy_loss", policy_loss.numpy())
+
+        # compute every gradient before any optimizer step changes the weights
+        policy_gradients = self.policy.compute_gradients(policy_loss, tape)
+        qf1_gradients = self.qf1.compute_gradients(qf1_loss, tape)
+        qf2_gradients = self.qf2.compute_gradients(qf2_loss, tape)
+        del tape
 
         # back prop gradients
-        self.policy.apply_gradients(
-            self.policy.compute_gradients(policy_loss, tape))
-        self.qf1.apply_gradients(
-            self.qf1.compute_gradients(qf1_loss, tape))
-        self.qf2.apply_gradients(
-            self.qf2.compute_gradients(qf2_loss, tape))
+        self.policy.apply_gradients(policy_gradients)
+        self.qf1.apply_gradients(qf1_gradients)
+        self.qf2.apply_gradients(qf2_gradients)
 
         # soft update target parameters
-        self.target_policy.soft_update(self.policy.get_weights())
-        self.target_qf1.soft_update(self.qf1.get_weights())
-        self.target_qf2.soft_update(self.qf2.get_weights())
+        self.target_policy.soft_update(self.policy.model.weights)
+        self.target_qf1.soft_update(self.qf1.model.weights)
+        self.target_qf2.soft_update(self.qf2.model.weights)
+
+        # return diagnostics to be recorded outside of the graph
+        return dict(
+            target_qf1_value=tf.reduce_mean(target_qf1_value),
+            target_qf2_value=tf.reduce_mean(target_qf2_value),
+            qf_targets=tf.reduce_mean(qf_targets),
+            qf1_value=tf.reduce_mean(qf1_value),
+            qf2_value=tf.reduce_mean(qf2_value),
+            qf1_loss=qf1_loss,
+            qf2_loss=qf2_loss,
+            policy_qf1_value=tf.reduce_mean(policy_qf1_value),
+            policy_qf2_value=tf.reduce_mean(policy_qf2_value),
+            policy_loss=policy_loss)
+
+    def update_algorithm(
+            self,
+            observations,
+            actions,
+            rewards,
+            next_observations,
+            terminals
+    ):
+        # update once using the entire batch of data
+        self.record_diagnostics(self.update_algorithm_n(
+            1,
+            observations,
+            actions,
+            rewards,
+            next_observations,
+            terminals))
+
+    def update_algorithm_n(
+            self,
+            num_updates,
+            observations,
+            actions,
+            rewards,
+            next_observations,
+            terminals
+    ):
+        # select from the observation dictionary and convert to tensors once
+        batch_of_data = [
+            tf.cast(observations[self.observation_key], tf.float32),
+            tf.cast(actions, tf.float32),
+            tf.cast(rewards, tf.float32),
+            tf.cast(next_observations[self.observation_key], tf.float32),
+            tf.cast(terminals, tf.float32)]
+        batch_size = int(batch_of_data[2].shape[0]) // num_updates
+
+        # update on each minibatch using the compiled update step
+        for i in range(num_updates):
+            diagnostics = self.update_step(*[
+                x[i * batch_size:(i + 1) * batch_size] for x in batch_of_data])
+
+        # the caller records the diagnostics of the last update only once
+        return diagnostics
@@ -127,7 +127,7 @@ def ddpg(
         num_workers=variant["num_workers"])
 
     # collect more training samples
-    sampler.set_weights(agent.get_weights())
+    sampler.set_weights(agent.get_weights(), version=agent.iteration)
     paths, returns, num_steps = sampler.collect(
         variant["num_warm_up_steps"],
         deterministic=False,
@@ -144,7 +144,7 @@ def ddpg(
         if iteration % variant["num_epochs_per_eval"] == 0:
 
             # evaluate the policy at this step
-            sampler.set_weights(agent.get_weights())
+            sampler.set_weights(agent.get_weights(), version=agent.iteration)
             paths, eval_returns, num_steps = sampler.collect(
                 variant["num_steps_per_eval"],
                 deterministic=True,
@@ -156,7 +156,7 @@ def ddpg(
             saver.save()
 
         # collect more training samples
-        sampler.set_weights(agent.get_weights())
+        sampler.set_weights(agent.get_weights(), version=agent.iteration)
         paths, train_returns, num_steps = sampler.collect(
             variant["num_steps_per_epoch"],
             deterministic=False,
@@ -5,7 +5,7 @@ from multiarchy import maybe_initialize_process
 from multiarchy.envs.normalized_env import NormalizedEnv
 from multiarchy.distributions.tanh_gaussian import TanhGaussian
 from multiarchy.distributions.gaussian import Gaussian
-from multiarchy.networks import dense
+from multiarchy.networks import dense_actor_critic
 from multiarchy.agents.policy_agent import PolicyAgent
 from multiarchy.agents.hierarchy_agent import HierarchyAgent
 from multiarchy.replay_buffers.step_replay_buffer import StepReplayBuffer
@@ -13,8 +13,9 @@ from multiarchy.relabelers.goal_conditioned import GoalConditioned
 from multiarchy.loggers.tensorboard_logger import TensorboardLogger
 from multiarchy.savers.local_saver import LocalSaver
 from multiarchy.samplers.parallel_sampler import ParallelSampler
+from multiarchy.baselines.off_policy_runner import run_off_policy_training
 from multiarchy.algorithms.sac import SAC
-import numpy as np
+import tensorflow as tf
 
 
 hierarchy_sac_variant = dict(
@@ -24,6 +25,7 @@ hierarchy_sac_variant = dict(
     time_skip=10,
     hidden_size=400,
     num_hidden_layers=2,
+    mixed_precision=False,
     reward_scale=1.0,
     discount=0.99,
     initial_alpha=0.1,
@@ -31,6 +33,7 @@ hierarchy_sac_variant = dict(
     qf_learning_rate=0.0003,
     tau=0.005,
     batch_size=256,
+    num_updates_per_sample=100,
     max_path_length=1000,
     num_workers=2,
     num_warm_up_steps=10000,
@@ -53,6 +56,10 @@ def hierarchy_sac(
     if env_kwargs is None:
         env_kwargs = {}
 
+    # optionally compute the hidden layers in float16 on the gpu with float32 variables
+    if variant["mixed_precision"]:
+        tf.keras.mixed_precision.experimental.set_policy("mixed_float16")
+
     # initialize the environment to track the cardinality of actions
     env = NormalizedEnv(env_class, **env_kwargs)
     action_dim = env.action_space.low.size
@@ -74,42 +81,46 @@ def hierarchy_sac(
     levels = []
     for level in range(variant["num_hierarchy_levels"]):
 
+        # create networks for each level in the hierarchy
+        (policy_model, qf1_model, qf2_model,
+         target_qf1_model, target_qf2_model) = dense_actor_critic(
+            observation_dim + (0 if level == 0 else observation_dim),
+            2 * (observation_dim if level == 0 else action_dim),
+            observation_dim + (0 if level == 0 else observation_dim) + (
+                observation_dim if level == 0 else action_dim),
+            hidden_size=variant["hidden_size"],
+            num_hidden_layers=variant["num_hidden_layers"])
+
         # create policies for each level in the hierarchy
         policy = TanhGaussian(
-            dense(
-                observation_dim + (0 if level == 0 else observation_dim),
-                2 * (observation_dim if level == 0 else action_dim),
-                hidden_size=variant["hidden_size"],
-                num_hidden_layers=variant["num_hidden_layers"]),
+            policy_model,
             optimizer_kwargs=dict(learning_rate=variant["policy_learning_rate"]),
             tau=variant["tau"],
             std=None)
 
         # create critics for each level in the hierarchy
         qf1 = Gaussian(
-            dense(
-                observation_dim + (0 if level == 0 else observation_dim) + (
-                    observation_dim if level == 0 else action_dim),
-                1,
-                hidden_size=variant["hidden_size"],
-                num_hidden_layers=variant["num_hidden_layers"]),
+            qf1_model,
             optimizer_kwargs=dict(learning_rate=variant["qf_learning_rate"]),
             tau=variant["tau"],
             std=1.0)
-        target_qf1 = qf1.clone()
+        target_qf1 = Gaussian(
+            target_qf1_model,
+            tau=variant["tau"],
+            optimizer_class=None,
+            std=1.0)
 
         # create critics for each level in the hierarchy
         qf2 = Gaussian(
-            dense(
-                observation_dim + (0 if level == 0 else observation_dim) + (
-                    observation_dim if level == 0 else action_dim),
-                1,
-                hidden_size=variant["hidden_size"],
-                num_hidden_layers=variant["num_hidden_layers"]),
+            qf2_model,
             optimizer_kwargs=dict(learning_rate=variant["qf_learning_rate"]),
             tau=variant["tau"],
             std=1.0)
-        target_qf2 = qf2.clone()
+        target_qf2 = Gaussian(
+            target_qf2_model,
+            tau=variant["tau"],
+            optimizer_class=None,
+            std=1.0)
 
         # relabel the rewards of the lower level policies
         relabeled_buffer = (
@@ -131,6 +142,7 @@ def hierarchy_sac(
             target_entropy=(-action_dim),
             observation_key=observation_key,
             batch_size=variant["batch_size"],
+            num_updates_per_sample=variant["num_updates_per_sample"],
             logger=logger,
             logging_prefix="sac_level{}/".format(level))
 
@@ -165,48 +177,11 @@ def hierarchy_sac(
         max_path_length=variant["max_path_length"],
         num_workers=variant["num_workers"])
 
-    # collect more training samples
-    sampler.set_weights(agent.get_weights())
-    paths, returns, num_steps = sampler.collect(
-        variant["num_warm_up_steps"],
-        deterministic=False,
-        keep_data=True,
-        workers_to_use=variant["num_workers"])
-
-    # insert the samples into the replay buffer
-    for o, a, r in paths:
-        replay_buffer.insert_path(o, a, r)
-
-    #  train for a specified number of iterations
-    for iteration in range(variant["num_epochs"]):
-
-        if iteration % variant["num_epochs_per_eval"] == 0:
-
-            # evaluate the policy at this step
-            sampler.set_weights(agent.get_weights())
-            paths, eval_returns, num_steps = sampler.collect(
-                variant["num_steps_per_eval"],
-                deterministic=True,
-                keep_data=False,
-                workers_to_use=variant["num_workers"])
-            logger.record("eval_mean_return", np.mean(eval_returns))
-
-            # save the replay buffer and the policies
-            saver.save()
-
-        # collect more training samples
-        sampler.set_weights(agent.get_weights())
-        paths, train_returns, num_steps = sampler.collect(
-            variant["num_steps_per_epoch"],
-            deterministic=False,
-            keep_data=True,
-            workers_to_use=1)
-        logger.record("train_mean_return", np.mean(train_returns))
-
-        # insert the samples into the replay buffer
-        for o, a, r in paths:
-            replay_buffer.insert_path(o, a, r)
-
-        # train once each for the number of steps collected
-        for i in range(num_steps):
-            agent.train()
+    # warm up the replay buffer then alternate between collecting and training
+    run_off_policy_training(
+        variant,
+        agent,
+        sampler,
+        replay_buffer,
+        logger,
+        saver)
@@ -0,0 +1,70 @@
+"""Author: Brandon Trabucco, Copyright 2019, MIT License"""
+
+
+import numpy as np
+
+
+def run_off_policy_training(
+        variant,
+        agent,
+        sampler,
+        replay_buffer,
+        logger,
+        saver
+):
+    # collect training samples to warm up the replay buffer
+    sampler.set_weights(agent.get_weights(), version=agent.iteration)
+    paths, returns, num_steps = sampler.collect(
+        variant["num_warm_up_steps"],
+        deterministic=False,
+        keep_data=True,
+        workers_to_use=variant["num_workers"])
+
+    # insert the samples into the replay buffer
+    replay_buffer.insert_paths(paths)
+
+    # collect training samples in the background
+    if variant["num_epochs"] > 0:
+        sampler.set_weights(agent.get_weights(), version=agent.iteration)
+        pending = sampler.collect_async(
+            variant["num_steps_per_epoch"],
+            deterministic=False,
+            keep_data=True,
+            workers_to_use=1)
+
+    #  train for a specified number of iterations
+    for iteration in range(variant["num_epochs"]):
+
+        # wait for the training samples collected in the background
+        paths, train_returns, num_steps = sampler.wait(pending)
+        logger.record("train_mean_return", np.mean(train_returns))
+
+        # insert the samples into the replay buffer
+        replay_buffer.insert_paths(paths)
+
+        if iteration % variant["num_epochs_per_eval"] == 0:
+
+            # evaluate the policy at this step
+            sampler.set_weights(agent.get_weights(), version=agent.iteration)
+            eval_paths, eval_returns, num_eval_steps = sampler.collect(
+                variant["num_steps_per_eval"],
+                deterministic=True,
+                keep_data=False,
+                workers_to_use=variant["num_workers"])
+            logger.record("eval_mean_return", np.mean(eval_returns))
+
+            # save the replay buffer and the policies
+            saver.save()
+
+        # collect more training samples while the agent is training
+        # unless this is the last epoch and nothing would wait for them
+        if iteration < variant["num_epochs"] - 1:
+            sampler.set_weights(agent.get_weights(), version=agent.iteration)
+            pending = sampler.collect_async(
+                variant["num_steps_per_epoch"],
+                deterministic=False,
+                keep_data=True,
+                workers_to_use=1)
+
+        # train once each for the number of steps collected
+        agent.train_n(num_steps)
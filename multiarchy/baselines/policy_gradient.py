@@ -112,7 +112,7 @@ def policy_gradient(
         if iteration % variant["num_epochs_per_eval"] == 0:
 
             # evaluate the policy at this step
-            sampler.set_weights(agent.get_weights())
+            sampler.set_weights(agent.get_weights(), version=agent.iteration)
             paths, eval_returns, num_steps = sampler.collect(
                 variant["num_steps_per_eval"],
                 deterministic=True,
@@ -124,7 +124,7 @@ def policy_gradient(
             saver.save()
 
         # collect more training samples
-        sampler.set_weights(agent.get_weights())
+        sampler.set_weights(agent.get_weights(), version=agent.iteration)
         paths, train_returns, num_steps = sampler.collect(
             variant["num_steps_per_epoch"],
             deterministic=False,
@@ -134,7 +134,7 @@ def ppo(
         if iteration % variant["num_epochs_per_eval"] == 0:
 
             # evaluate the policy at this step
-            sampler.set_weights(agent.get_weights())
+            sampler.set_weights(agent.get_weights(), version=agent.iteration)
             paths, eval_returns, num_steps = sampler.collect(
                 variant["num_steps_per_eval"],
                 deterministic=True,
@@ -146,7 +146,7 @@ def ppo(
             saver.save()
 
         # collect more training samples
-        sampler.set_weights(agent.get_weights())
+        sampler.set_weights(agent.get_weights(), version=agent.iteration)
         paths, train_returns, num_steps = sampler.collect(
             variant["num_steps_per_epoch"],
             deterministic=False,
@@ -144,7 +144,7 @@ def sac(
         num_workers=variant["num_workers"])
 
     # collect more training samples
-    sampler.set_weights(agent.get_weights())
+    sampler.set_weights(agent.get_weights(), version=agent.iteration)
     paths, returns, num_steps = sampler.collect(
         variant["num_warm_up_steps"],
         deterministic=False,
@@ -161,7 +161,7 @@ def sac(
         if iteration % variant["num_epochs_per_eval"] == 0:
 
             # evaluate the policy at this step
-            sampler.set_weights(agent.get_weights())
+            sampler.set_weights(agent.get_weights(), version=agent.iteration)
             paths, eval_returns, num_steps = sampler.collect(
                 variant["num_steps_per_eval"],
                 deterministic=True,
@@ -173,7 +173,7 @@ def sac(
             saver.save()
 
         # collect more training samples
-        sampler.set_weights(agent.get_weights())
+        sampler.set_weights(agent.get_weights(), version=agent.iteration)
         paths, train_returns, num_steps = sampler.collect(
             variant["num_steps_per_epoch"],
             deterministic=False,
@@ -3,14 +3,15 @@
 
 from multiarchy.envs.normalized_env import NormalizedEnv
 from multiarchy.distributions.gaussian import Gaussian
-from multiarchy.networks import dense
+from multiarchy.networks import dense_actor_critic
 from multiarchy.agents.policy_agent import PolicyAgent
 from multiarchy.replay_buffers.step_replay_buffer import StepReplayBuffer
 from multiarchy.loggers.tensorboard_logger import TensorboardLogger
 from multiarchy.samplers.parallel_sampler import ParallelSampler
 from multiarchy.savers.local_saver import LocalSaver
+from multiarchy.baselines.off_policy_runner import run_off_policy_training
 from multiarchy.algorithms.td3 import TD3
-import numpy as np
+import tensorflow as tf
 
 
 td3_variant = dict(
@@ -18,6 +19,7 @@ td3_variant = dict(
     logging_dir="./",
     hidden_size=400,
     num_hidden_layers=2,
+    mixed_precision=False,
     exploration_noise_std=0.1,
     reward_scale=1.0,
     discount=0.99,
@@ -27,6 +29,7 @@ td3_variant = dict(
     qf_learning_rate=0.0003,
     tau=0.005,
     batch_size=256,
+    num_updates_per_sample=100,
     max_path_length=1000,
     num_warm_up_steps=10000,
     num_steps_per_epoch=1000,
@@ -45,6 +48,10 @@ def td3(
     if env_kwargs is None:
         env_kwargs = {}
 
+    # optionally compute the hidden layers in float16 on the gpu with float32 variables
+    if variant["mixed_precision"]:
+        tf.keras.mixed_precision.experimental.set_policy("mixed_float16")
+
     # initialize the environment to track the cardinality of actions
     env = NormalizedEnv(env_class, **env_kwargs)
     action_dim = env.action_space.low.size
@@ -59,40 +66,45 @@ def td3(
     logger = TensorboardLogger(
         replay_buffer, variant["logging_dir"])
 
+    # create networks for the policy and critics
+    (policy_model, qf1_model, qf2_model,
+     target_qf1_model, target_qf2_model) = dense_actor_critic(
+        observation_dim,
+        action_dim,
+        observation_dim + action_dim,
+        hidden_size=variant["hidden_size"],
+        num_hidden_layers=variant["num_hidden_layers"],
+        policy_output_activation="tanh")
+
     # create policies for each level in the hierarchy
     policy = Gaussian(
-        dense(
-            observation_dim,
-            action_dim,
-            output_activation="tanh",
-            hidden_size=variant["hidden_size"],
-            num_hidden_layers=variant["num_hidden_layers"]),
+        policy_model,
         optimizer_kwargs=dict(learning_rate=variant["policy_learning_rate"]),
         tau=variant["tau"],
         std=variant["exploration_noise_std"])
     target_policy = policy.clone()
 
     qf1 = Gaussian(
-        dense(
-            observation_dim + action_dim,
-            1,
-            hidden_size=variant["hidden_size"],
-            num_hidden_layers=variant["num_hidden_layers"]),
+        qf1_model,
         optimizer_kwargs=dict(learning_rate=variant["qf_learning_rate"]),
         tau=variant["tau"],
         std=1.0)
-    target_qf1 = qf1.clone()
+    target_qf1 = Gaussian(
+        target_qf1_model,
+        tau=variant["tau"],
+        optimizer_class=None,
+        std=1.0)
 
     qf2 = Gaussian(
-        dense(
-            observation_dim + action_dim,
-            1,
-            hidden_size=variant["hidden_size"],
-            num_hidden_layers=variant["num_hidden_layers"]),
+        qf2_model,
         optimizer_kwargs=dict(learning_rate=variant["qf_learning_rate"]),
         tau=variant["tau"],
         std=1.0)
-    target_qf2 = qf2.clone()
+    target_qf2 = Gaussian(
+        target_qf2_model,
+        tau=variant["tau"],
+        optimizer_class=None,
+        std=1.0)
 
     # train the agent using soft actor critic
     algorithm = TD3(
@@ -109,6 +121,7 @@ def td3(
         target_noise=variant["target_noise"],
         observation_key=observation_key,
         batch_size=variant["batch_size"],
+        num_updates_per_sample=variant["num_updates_per_sample"],
         logger=logger,
         logging_prefix="td3/")
 
@@ -139,47 +152,11 @@ def td3(
         max_path_length=variant["max_path_length"],
         num_workers=variant["num_workers"])
 
-    # collect more training samples
-    sampler.set_weights(agent.get_weights())
-    paths, returns, num_steps = sampler.collect(
-        variant["num_warm_up_steps"],
-        deterministic=False,
-        keep_data=True,
-        workers_to_use=variant["num_workers"])
-
-    # insert the samples into the replay buffer
-    for o, a, r in paths:
-        replay_buffer.insert_path(o, a, r)
-
-    #  train for a specified number of iterations
-    for iteration in range(variant["num_epochs"]):
-
-        if iteration % variant["num_epochs_per_eval"] == 0:
-            # evaluate the policy at this step
-            sampler.set_weights(agent.get_weights())
-            paths, eval_returns, num_steps = sampler.collect(
-                variant["num_steps_per_eval"],
-                deterministic=True,
-                keep_data=False,
-                workers_to_use=variant["num_workers"])
-            logger.record("eval_mean_return", np.mean(eval_returns))
-
-            # save the replay buffer and the policies
-            saver.save()
-
-        # collect more training samples
-        sampler.set_weights(agent.get_weights())
-        paths, train_returns, num_steps = sampler.collect(
-            variant["num_steps_per_epoch"],
-            deterministic=False,
-            keep_data=True,
-            workers_to_use=1)
-        logger.record("train_mean_return", np.mean(train_returns))
-
-        # insert the samples into the replay buffer
-        for o, a, r in paths:
-            replay_buffer.insert_path(o, a, r)
-
-        # train once each for the number of steps collected
-        for i in range(num_steps):
-            agent.train()
+    # warm up the replay buffer then alternate between collecting and training
+    run_off_policy_training(
+        variant,
+        agent,
+        sampler,
+        replay_buffer,
+        logger,
+        saver)
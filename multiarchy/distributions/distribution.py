@@ -3,8 +3,9 @@
 
 from multiarchy import maybe_initialize_process
 from abc import ABC, abstractmethod
-import pickle as pkl
 import tensorflow as tf
+import pickle as pkl
+import json
 
 
 class Distribution(ABC):
@@ -23,7 +24,15 @@ class Distribution(ABC):
         self.tau = tau
         self.optimizer_class = optimizer_class
         self.optimizer_kwargs = optimizer_kwargs
-        self.optimizer = optimizer_class(**optimizer_kwargs)
+        # models that are never trained such as target networks need no optimizer
+        self.optimizer = (
+            None if optimizer_class is None else optimizer_class(**optimizer_kwargs))
+
+        # scale the loss so float16 gradients do not underflow under mixed precision
+        if self.optimizer is not None and (
+                tf.keras.mixed_precision.experimental.global_policy().name == "mixed_float16"):
+            self.optimizer = tf.keras.mixed_precision.experimental.LossScaleOptimizer(
+                self.optimizer, "dynamic")
 
     def clone(
             self
@@ -49,8 +58,14 @@ class Distribution(ABC):
         # initialize tensorflow and the multiprocessing interface
         maybe_initialize_process()
 
+        # rebuilt models always compute in float32 whatever policy they were built with
+        config = json.loads(state["model_json"])
+        for layer in config["config"]["layers"]:
+            if "dtype" in layer["config"]:
+                layer["config"]["dtype"] = "float32"
+
         # handle pickle actions so the agent can be sent between threads
-        self.model = tf.keras.models.model_from_json(state["model_json"])
+        self.model = tf.keras.models.model_from_json(json.dumps(config))
         self.model.set_weights(state["model_weights"])
         self.tau = state["tau"]
 
@@ -65,16 +80,21 @@ class Distribution(ABC):
             self,
             weights
     ):
-        # wrapper functions to transfer model state
-        self.model.set_weights([
-            self.tau * w1 + (1.0 - self.tau) * w2 for w1, w2 in zip(
-                weights, self.model.get_weights())])
+        # move each variable towards the given weights in place
+        for w1, w2 in zip(weights, self.model.weights):
+            w2.assign_add(self.tau * (w1 - w2))
 
     def compute_gradients(
             self,
             loss,
             tape
     ):
+        # gradients of a scaled loss are unscaled before they are applied
+        if isinstance(self.optimizer, tf.keras.mixed_precision.experimental.LossScaleOptimizer):
+            return self.optimizer.get_unscaled_gradients(tape.gradient(
+                loss, self.model.trainable_variables,
+                output_gradients=self.optimizer.get_scaled_loss(tf.ones_like(loss))))
+
         # apply the gradient update rule to this model
         return tape.gradient(loss, self.model.trainable_variables)
 
@@ -25,12 +25,50 @@ def dense(
                 mode='fan_in',
                 distribution='uniform'))(hidden)
 
-    # build an output layer
+    # build an output layer that stays in float32 under mixed precision
     outputs = tf.keras.layers.Dense(
         output_size,
         activation=output_activation,
+        dtype=tf.float32,
         kernel_initializer=tf.keras.initializers.RandomUniform(
             minval=-0.003, maxval=0.003))(hidden)
 
     # finally build the model
-    return tf.keras.models.Model(inputs=visible, outputs=outputs)
\ No newline at end of file
+    return tf.keras.models.Model(inputs=visible, outputs=outputs)
+
+
+def dense_actor_critic(
+    policy_input_size,
+    policy_output_size,
+    qf_input_size,
+    hidden_size=400,
+    num_hidden_layers=2,
+    policy_output_activation=None
+):
+    # construct a policy and two critics that share the same layer specs
+    with tf.name_scope("actor_critic"):
+        policy = dense(
+            policy_input_size,
+            policy_output_size,
+            hidden_size=hidden_size,
+            num_hidden_layers=num_hidden_layers,
+            output_activation=policy_output_activation)
+        qf1 = dense(
+            qf_input_size,
+            1,
+            hidden_size=hidden_size,
+            num_hidden_layers=num_hidden_layers)
+        qf2 = dense(
+            qf_input_size,
+            1,
+            hidden_size=hidden_size,
+            num_hidden_layers=num_hidden_layers)
+
+        # build target critics with the same architecture
+        target_qf1 = tf.keras.models.clone_model(qf1)
+        target_qf2 = tf.keras.models.clone_model(qf2)
+
+    # the target critics start with the same weights as the critics
+    target_qf1.set_weights(qf1.get_weights())
+    target_qf2.set_weights(qf2.get_weights())
+    return policy, qf1, qf2, target_qf1, target_qf2
@@ -32,8 +32,8 @@ class PathReplayBuffer(ReplayBuffer):
             structure,
             data
     ):
-        # insert samples into the numpy array
-        structure[self.head, int(self.terminals[self.head]) % self.max_path_length, ...] = data
+        # insert every time step of a path into the numpy array
+        structure[self.head, :data.shape[0], ...] = data
 
     def insert_path(
             self,
@@ -43,25 +43,23 @@ class PathReplayBuffer(ReplayBuffer):
     ):
         # insert a path into the replay buffer
         self.total_paths += 1
-        observations = observations[:self.max_path_length]
-        actions = actions[:self.max_path_length]
-        rewards = rewards[:self.max_path_length]
+        observations, actions, rewards = nested_apply(
+            lambda x: x[:self.max_path_length, ...], (observations, actions, rewards))
 
         # inflate the replay buffer if not inflated
         if any([self.observations is None, self.actions is None, self.rewards is None,
                 self.terminals is None]):
-            self.observations = nested_apply(self.inflate_backend, observations[0])
-            self.actions = nested_apply(self.inflate_backend, actions[0])
+            self.observations = nested_apply(lambda x: self.inflate_backend(x[0]), observations)
+            self.actions = nested_apply(lambda x: self.inflate_backend(x[0]), actions)
             self.rewards = self.inflate_backend(rewards[0])
             self.terminals = np.zeros([self.max_num_paths], dtype=np.int32)
 
         # insert all samples into the buffer
-        for time_step, (o, a, r) in enumerate(zip(observations, actions, rewards)):
-            self.terminals[self.head] = time_step
-            nested_apply(self.insert_backend, self.observations, o)
-            nested_apply(self.insert_backend, self.actions, a)
-            self.insert_backend(self.rewards, r)
-            self.total_steps += 1
+        self.terminals[self.head] = len(rewards) - 1
+        nested_apply(self.insert_backend, self.observations, observations)
+        nested_apply(self.insert_backend, self.actions, actions)
+        self.insert_backend(self.rewards, rewards)
+        self.total_steps += len(rewards)
 
         # increment the head and size
         self.head = (self.head + 1) % self.max_num_paths
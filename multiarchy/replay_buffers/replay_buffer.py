@@ -78,6 +78,14 @@ class ReplayBuffer(ABC):
     ):
         return NotImplemented
 
+    def insert_paths(
+            self,
+            paths
+    ):
+        # insert many paths into the replay buffer
+        for observations, actions, rewards in paths:
+            self.insert_path(observations, actions, rewards)
+
     @abstractmethod
     def sample(
             self,
@@ -4,34 +4,107 @@
 from multiarchy import nested_apply
 from multiarchy.replay_buffers.replay_buffer import ReplayBuffer
 import numpy as np
+import tensorflow as tf
 
 
 class StepReplayBuffer(ReplayBuffer):
 
     def __init__(
             self,
-            max_num_steps=1000000
+            max_num_steps=1000000,
+            device=None
     ):
         ReplayBuffer.__init__(self)
 
         # parameters to control how the buffer is created and managed
         self.max_num_steps = max_num_steps
 
+        # optionally keep the samples in variables on a device such as /GPU:0
+        self.device = device
+
+    def device_backend(
+            self,
+            x
+    ):
+        # move a numpy array into a variable on the device
+        if self.device is None or x is None:
+            return x
+        with tf.device(self.device):
+            return tf.Variable(x, trainable=False)
+
+    def host_backend(
+            self,
+            x
+    ):
+        # move a variable on the device back into a numpy array
+        if self.device is None or x is None:
+            return x
+        return x.numpy()
+
     def inflate_backend(
             self,
             x
     ):
-        # create numpy arrays to store samples
+        # create numpy arrays or device variables to store samples
         x = x if isinstance(x, np.ndarray) else np.array(x)
-        return np.zeros_like(x, shape=[self.max_num_steps, *x.shape])
+        return self.device_backend(np.zeros_like(x, shape=[self.max_num_steps, *x.shape]))
+
+    def ring_slices(
+            self,
+            num_steps
+    ):
+        # split a block of samples into at most two slices around the ring
+        first = min(num_steps, self.max_num_steps - self.head)
+        slices = [(slice(self.head, self.head + first), slice(0, first))]
+        if num_steps > first:
+            slices.append((slice(0, num_steps - first), slice(first, num_steps)))
+        return slices
 
     def insert_backend(
             self,
             structure,
-            data
+            data,
+            slices
     ):
-        # insert samples into the numpy array
-        structure[self.head, ...] = data
+        # insert a block of samples into the ring buffer using the slices
+        for destination, source in slices:
+            if isinstance(structure, np.ndarray):
+                structure[destination, ...] = data[source, ...]
+
+            # variables on the device are assigned to in place
+            else:
+                structure[destination, ...].assign(data[source, ...])
+
+    def sample_backend(
+            self,
+            structure,
+            idx
+    ):
+        # gather samples from the numpy array or the variable on the device
+        # using indices that are already wrapped into the ring buffer
+        if isinstance(structure, np.ndarray):
+            return structure[idx, ...]
+        return tf.gather(structure, idx)
+
+    def to_dict(
+            self,
+    ):
+        # save the replay buffer to a dictionary of numpy arrays
+        state = ReplayBuffer.to_dict(self)
+        state["observations"] = nested_apply(self.host_backend, self.observations)
+        state["actions"] = nested_apply(self.host_backend, self.actions)
+        state["rewards"] = self.host_backend(self.rewards)
+        return state
+
+    def from_dict(
+            self,
+            state
+    ):
+        # load the replay buffer from a dictionary of numpy arrays
+        ReplayBuffer.from_dict(self, state)
+        self.observations = nested_apply(self.device_backend, self.observations)
+        self.actions = nested_apply(self.device_backend, self.actions)
+        self.rewards = self.device_backend(self.rewards)
 
     def insert_path(
             self,
@@ -40,30 +113,68 @@ class StepReplayBuffer(ReplayBuffer):
             rewards
     ):
         # insert a path into the replay buffer
-        self.total_paths += 1
-        observations = observations[:self.max_num_steps]
-        actions = actions[:self.max_num_steps]
-        rewards = rewards[:self.max_num_steps]
+        self.insert_paths([(observations, actions, rewards)])
+
+    def insert_paths(
+            self,
+            paths
+    ):
+        # insert many paths into the replay buffer
+        paths = [nested_apply(lambda x: x[:self.max_num_steps, ...], path)
+                 for path in paths if len(path[2]) > 0]
+        if len(paths) == 0:
+            return
 
         # inflate the replay buffer if not inflated
         if any([self.observations is None, self.actions is None, self.rewards is None,
                 self.terminals is None]):
-            self.observations = nested_apply(self.inflate_backend, observations[0])
-            self.actions = nested_apply(self.inflate_backend, actions[0])
-            self.rewards = self.inflate_backend(np.squeeze(rewards[0]))
-            self.terminals = self.inflate_backend(np.array([0, 0]))
+            self.observations = nested_apply(lambda x: self.inflate_backend(x[0]), paths[0][0])
+            self.actions = nested_apply(lambda x: self.inflate_backend(x[0]), paths[0][1])
+            self.rewards = self.inflate_backend(np.squeeze(paths[0][2][0]))
+
+            # time steps and path ids stay on the host for computing indices
+            self.terminals = np.zeros([self.max_num_steps, 2], dtype=np.int32)
+
+        # concatenate all paths into contiguous arrays
+        observations = nested_apply(
+            lambda *x: np.concatenate(x), *[o for o, a, r in paths])
+        actions = nested_apply(
+            lambda *x: np.concatenate(x), *[a for o, a, r in paths])
+        rewards = np.concatenate([r for o, a, r in paths])
+
+        # time steps count up within each path and path ids count up across paths
+        lengths = np.array([len(r) for o, a, r in paths])
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        terminals = np.stack([
+            np.arange(lengths.sum()) - starts,
+            np.repeat(self.total_paths + 1 + np.arange(len(paths)), lengths)], -1)
+        rewards = np.reshape(rewards, [terminals.shape[0], *self.rewards.shape[1:]])
+
+        # only the most recent samples fit when more than the capacity is given
+        num_steps = terminals.shape[0]
+        self.total_paths += len(paths)
+        self.total_steps += num_steps
+        if num_steps > self.max_num_steps:
+            self.head = (self.head + num_steps - self.max_num_steps) % self.max_num_steps
+            observations, actions, rewards, terminals = nested_apply(
+                lambda x: x[-self.max_num_steps:, ...], (observations, actions, rewards, terminals))
+            num_steps = self.max_num_steps
+
+        # the ring buffer slices are shared by every array in the buffer
+        slices = self.ring_slices(num_steps)
+
+        def insert(structure, data):
+            self.insert_backend(structure, data, slices)
 
         # insert all samples into the buffer
-        for time_step, (o, a, r) in enumerate(zip(observations, actions, rewards)):
-            nested_apply(self.insert_backend, self.observations, o)
-            nested_apply(self.insert_backend, self.actions, a)
-            self.insert_backend(self.rewards, np.squeeze(r))
-            self.insert_backend(self.terminals, np.array([time_step, self.total_paths]))
+        nested_apply(insert, self.observations, observations)
+        nested_apply(insert, self.actions, actions)
+        insert(self.rewards, rewards)
+        insert(self.terminals, terminals)
 
-            # increment the head and size
-            self.head = (self.head + 1) % self.max_num_steps
-            self.size = min(self.size + 1, self.max_num_steps)
-            self.total_steps += 1
+        # increment the head and size
+        self.head = (self.head + num_steps) % self.max_num_steps
+        self.size = min(self.size + num_steps, self.max_num_steps)
 
     def sample(
             self,
@@ -72,22 +183,25 @@ class StepReplayBuffer(ReplayBuffer):
             goal_skip=1,
             hierarchy_selector=(lambda x: x)
     ):
-        # handle cases when we want to sample everything
-        batch_size = batch_size if batch_size > 0 else self.size
+        # handle cases when we want to sample everything exactly once
+        if batch_size <= 0:
+            batch_size = self.size
+            idx = np.random.permutation(self.size)
 
-        # sample transition for a hierarchy of policies
-        idx = np.random.choice(
-            self.size, size=batch_size, replace=(self.size < batch_size))
+        # otherwise sample transitions for a hierarchy of policies with replacement
+        # which avoids permuting the entire buffer for every batch
+        else:
+            idx = np.random.randint(self.size, size=batch_size)
 
-        # force the samples to occur every time_skip
-        idx = idx - self.terminals[idx, 0].astype(np.int32) % time_skip
-        next_idx = np.minimum(idx + time_skip, self.max_num_steps)
+        # force the samples to occur every time_skip and wrap around the ring buffer
+        idx = (idx - self.terminals[idx, 0].astype(np.int32) % time_skip) % self.max_num_steps
+        next_idx = (idx + time_skip) % self.max_num_steps
 
         def sample_observations(data):
-            return data[idx, ...]
+            return self.sample_backend(data, idx)
 
         def sample_observations_last(data):
-            return data[next_idx, ...]
+            return self.sample_backend(data, next_idx)
 
         # sample current batch from a nested structure
         observations = nested_apply(sample_observations, self.observations)
@@ -97,27 +211,27 @@ class StepReplayBuffer(ReplayBuffer):
         # sum the rewards across the horizon where valid
         rewards = 0.0
         for j in [(idx + i) % self.max_num_steps for i in range(time_skip)]:
-            rewards = rewards + (self.rewards[j, ...] * np.equal(
+            rewards = rewards + (self.sample_backend(self.rewards, j) * np.equal(
                 self.terminals[j, 1], self.terminals[idx, 1]).astype(np.float32))
 
         # sample current batch from a nested structure
         next_observations = nested_apply(sample_observations_last, self.observations)
         next_observations["goal"] = hierarchy_selector(next_observations["goal"])
-        terminals = np.ones([batch_size])
+        terminals = np.ones([batch_size], dtype=np.float32)
 
         # force the achieved goals to occur every goal_skip
-        goal_idx = np.minimum(idx - self.terminals[idx, 0].astype(
-            np.int32) % goal_skip + goal_skip, self.max_num_steps)
-        next_goal_idx = np.minimum(next_idx - self.terminals[next_idx, 0].astype(
-            np.int32) % goal_skip + goal_skip, self.max_num_steps)
+        goal_idx = (idx - self.terminals[idx, 0].astype(
+            np.int32) % goal_skip + goal_skip) % self.max_num_steps
+        next_goal_idx = (next_idx - self.terminals[next_idx, 0].astype(
+            np.int32) % goal_skip + goal_skip) % self.max_num_steps
 
         # sample observation goals achieved by the agent
         def sample_goals(data):
-            return data[goal_idx, ...]
+            return self.sample_backend(data, goal_idx)
 
         # sample observation goals achieved by the agent
         def sample_goals_last(data):
-            return data[next_goal_idx, ...]
+            return self.sample_backend(data, next_goal_idx)
 
         # sample current batch from a nested structure
         achieved_goals = nested_apply(sample_goals, self.observations)
@@ -4,28 +4,48 @@
 from multiarchy import maybe_initialize_process
 from multiarchy.samplers.sequential_sampler import SequentialSampler
 from multiarchy.samplers.sampler import Sampler
+import tensorflow as tf
 import multiprocessing as m
+import pickle as pkl
 import time
+import os
 
 
 def create_sampler_process(
         env,
         agent,
         max_path_length,
-        max_buffer_size=100
+        max_buffer_size=100,
+        num_threads=1,
+        cpu_affinity=None
 ):
     # create a new process to handle sampling trajectories
     set_weights_input_queue = m.Queue(maxsize=max_buffer_size)
     collect_input_queue = m.Queue(maxsize=max_buffer_size)
     collect_output_queue = m.Queue(maxsize=max_buffer_size)
 
+    # spawned processes read the openmp thread count from the inherited environment
+    # before they import numpy and tensorflow so it is set around the start
+    omp_num_threads = os.environ.get("OMP_NUM_THREADS")
+    if num_threads is not None:
+        os.environ["OMP_NUM_THREADS"] = str(num_threads)
+
+    # the agent is serialized here so the process can configure tensorflow first
     m.Process(target=process_function, args=(
         env,
-        agent,
+        pkl.dumps(agent),
         max_path_length,
         set_weights_input_queue,
         collect_input_queue,
-        collect_output_queue)).start()
+        collect_output_queue,
+        num_threads,
+        cpu_affinity)).start()
+
+    # restore the thread count of the main process
+    if omp_num_threads is None:
+        os.environ.pop("OMP_NUM_THREADS", None)
+    else:
+        os.environ["OMP_NUM_THREADS"] = omp_num_threads
 
     return (set_weights_input_queue,
             collect_input_queue,
@@ -38,11 +58,26 @@ def process_function(
         max_path_length,
         set_weights_input_queue,
         collect_input_queue,
-        collect_output_queue
+        collect_output_queue,
+        num_threads=1,
+        cpu_affinity=None
 ):
+    # optionally keep this process on a fixed set of cores
+    if cpu_affinity is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_affinity)
+
+    # limit the thread pools so workers do not compete with the trainer
+    if num_threads is not None:
+        tf.config.threading.set_inter_op_parallelism_threads(num_threads)
+        tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+
     # initialize tensorflow and the multiprocessing interface
     maybe_initialize_process(use_gpu=False)
 
+    # workers roll out on the cpu in float32 whatever policy the trainer uses
+    tf.keras.mixed_precision.experimental.set_policy("float32")
+    agent = pkl.loads(agent)
+
     # create a sampler instance within this thread
     sequential_sampler = SequentialSampler(
         env,
@@ -56,7 +91,7 @@ def process_function(
 
         # set the weights of the policy
         if not set_weights_input_queue.empty():
-            sequential_sampler.set_weights(set_weights_input_queue.get())
+            sequential_sampler.set_weights(pkl.loads(set_weights_input_queue.get()))
 
         # collect k paths of samples and pass to the main process
         if not collect_input_queue.empty():
@@ -82,7 +117,9 @@ class ParallelSampler(Sampler):
             agent,
             max_path_length=1000,
             num_workers=1,
-            max_buffer_size=100
+            max_buffer_size=100,
+            num_threads_per_worker=1,
+            pin_workers=False
     ):
         # create several processes in which sampling will occur
         self.num_workers = num_workers
@@ -90,6 +127,13 @@ class ParallelSampler(Sampler):
         self.collect_input_queues = []
         self.collect_output_queues = []
 
+        # the version of the weights most recently sent to the workers
+        self.weights_version = None
+
+        # each worker may be pinned to a distinct core available to this process
+        cores = (sorted(os.sched_getaffinity(0))
+                 if pin_workers and hasattr(os, "sched_getaffinity") else None)
+
         # for each process keep track of input and output queues
         for i in range(num_workers):
             (set_weights_input_queue,
@@ -98,7 +142,9 @@ class ParallelSampler(Sampler):
                 env,
                 agent,
                 max_path_length,
-                max_buffer_size=max_buffer_size)
+                max_buffer_size=max_buffer_size,
+                num_threads=num_threads_per_worker,
+                cpu_affinity=None if cores is None else {cores[i % len(cores)]})
 
             self.set_weights_input_queues.append(set_weights_input_queue)
             self.collect_input_queues.append(collect_input_queue)
@@ -106,13 +152,20 @@ class ParallelSampler(Sampler):
 
     def set_weights(
             self,
-            weights
+            weights,
+            version=None
     ):
-        # set the weights for each agent in each process
+        # skip sending the weights when the same version was already sent
+        if version is not None and version == self.weights_version:
+            return
+        self.weights_version = version
+
+        # serialize the weights once and share the bytes with every process
+        weights = pkl.dumps(weights)
         for q in self.set_weights_input_queues:
             q.put(weights)
 
-    def collect(
+    def collect_async(
             self,
             min_num_steps_to_collect,
             deterministic=False,
@@ -130,15 +183,35 @@ class ParallelSampler(Sampler):
             self.collect_input_queues[i].put((
                 target_count, deterministic, keep_data, render, render_kwargs))
 
+        # return the workers that will produce results
+        return list(range(workers_to_use))
+
+    def wait(
+            self,
+            workers
+    ):
         # return paths from the workers into the main process
-        results = []
-        while len(results) < workers_to_use:
-            time.sleep(0.1)
-            for q in self.collect_output_queues:
-                if not q.empty():
-                    results.append(q.get())
+        results = [self.collect_output_queues[i].get() for i in workers]
 
         # combine the paths returns and steps from each of the remote samplers
         paths = [path for item in results for path in item[0]]
         returns = [path_return for item in results for path_return in item[1]]
         return paths, returns, sum([item[2] for item in results])
+
+    def collect(
+            self,
+            min_num_steps_to_collect,
+            deterministic=False,
+            keep_data=False,
+            render=False,
+            render_kwargs=None,
+            workers_to_use=1
+    ):
+        # collect paths from the workers and wait for them to finish
+        return self.wait(self.collect_async(
+            min_num_steps_to_collect,
+            deterministic=deterministic,
+            keep_data=keep_data,
+            render=render,
+            render_kwargs=render_kwargs,
+            workers_to_use=workers_to_use))
@@ -9,9 +9,10 @@ class Sampler(ABC):
     @abstractmethod
     def set_weights(
             self,
-            weights
+            weights,
+            version=None
     ):
-        # set the weights for the agent in this sampler
+        # set the weights for the agent in this sampler unless the version is unchanged
         return NotImplemented
 
     @abstractmethod
@@ -1,7 +1,10 @@
 """Author: Brandon Trabucco, Copyright 2019, MIT License"""
 
 
+from multiarchy import nested_apply
+from multiarchy import flatten
 from multiarchy.samplers.sampler import Sampler
+import numpy as np
 
 
 class SequentialSampler(Sampler):
@@ -17,10 +20,19 @@ class SequentialSampler(Sampler):
         self.agent = agent
         self.max_path_length = max_path_length
 
+        # the version of the weights most recently given to the agent
+        self.weights_version = None
+
     def set_weights(
             self,
-            weights
+            weights,
+            version=None
     ):
+        # skip setting the weights when the same version was already set
+        if version is not None and version == self.weights_version:
+            return
+        self.weights_version = version
+
         # set the weights for the agent in this sampler
         self.agent.set_weights(weights)
 
@@ -40,45 +52,89 @@ class SequentialSampler(Sampler):
         paths = []
         returns = []
 
+        # bind methods and attributes used every time step outside of the loop
+        react = self.agent.react
+        reset = self.env.reset
+        step = self.env.step
+        render_env = self.env.render if render else None
+        apply = nested_apply
+        leaves = flatten
+        max_path_length = self.max_path_length
+
+        # functions for allocating and truncating the arrays of a path
+        def allocate(x):
+            x = np.asarray(x)
+            return np.empty([max_path_length, *x.shape], dtype=x.dtype)
+
+        def truncate(data):
+            return data[:path_length, ...]
+
         # start collecting many trajectories
         num_steps_collected = 0
         while num_steps_collected < min_num_steps_to_collect:
 
             # keep track of observations actions and rewards
-            observations = []
-            actions = []
-            rewards = []
+            observations = None
+            actions = None
+            observation_keys = None
+            observation_leaves = None
+            action_leaves = None
+            rewards = np.empty([max_path_length], dtype=np.float32)
 
             # reset the environment at the start of each trajectory
-            observation_t = self.env.reset()
+            observation_t = reset()
             path_return = 0.0
 
+            # whether the environment provides a goal is fixed for the episode
+            has_goal = "goal" in observation_t
+
             # unroll the episode until done or max_path_length is attained
-            for time_step in range(self.max_path_length):
+            for time_step in range(max_path_length):
 
                 # check if the environment has a goal and send it in
                 num_steps_collected += 1
-                atoms_t, actions_t, goals_t = self.agent.react(
+                atoms_t, actions_t, goals_t = react(
                     observation_t,
                     time_step,
-                    observation_t["goal"] if "goal" in observation_t else [],
+                    observation_t["goal"] if has_goal else [],
                     deterministic=deterministic)
 
                 # save the observation and the actions from the agent
                 if keep_data:
                     observation_t["goal"] = goals_t
-                    observations.append(observation_t)
-                    actions.append(actions_t)
+                    if observations is None:
+                        observations = apply(allocate, observation_t)
+                        actions = apply(allocate, actions_t)
+
+                        # the flat leaves share memory with the nested arrays
+                        observation_keys = list(observation_t)
+                        observation_leaves = leaves(observations)
+                        action_leaves = leaves(actions)
+
+                    # leaves are paired by position so the structure must not change
+                    observation_leaves_t = leaves(observation_t)
+                    action_leaves_t = leaves(actions_t)
+                    if (list(observation_t) != observation_keys or
+                            len(observation_leaves_t) != len(observation_leaves) or
+                            len(action_leaves_t) != len(action_leaves)):
+                        raise ValueError(
+                            "observations and actions changed structure within an episode")
+
+                    # write each leaf of the time step into its own array
+                    for data, x in zip(observation_leaves, observation_leaves_t):
+                        data[time_step, ...] = x
+                    for data, x in zip(action_leaves, action_leaves_t):
+                        data[time_step, ...] = x
 
                 # update the environment with the atomic actions
-                observation_t, reward_t, done, info = self.env.step(atoms_t)
+                observation_t, reward_t, done, info = step(atoms_t)
                 path_return += reward_t
                 if keep_data:
-                    rewards.append(reward_t)
+                    rewards[time_step] = reward_t
 
                 # and possibly render the updated environment (to a video)
                 if render:
-                    self.env.render(**render_kwargs)
+                    render_env(**render_kwargs)
 
                 # exit if the simulation has reached a terminal state
                 if done:
@@ -87,7 +143,8 @@ class SequentialSampler(Sampler):
             # save the episode into a list to send to the replay buffer
             returns.append(path_return)
             if keep_data:
-                paths.append((observations, actions, rewards))
+                path_length = time_step + 1
+                paths.append(nested_apply(truncate, (observations, actions, rewards)))
 
         # return the paths and the number of steps collected so far
         return paths, returns, num_steps_collected